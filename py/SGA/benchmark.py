@@ -0,0 +1,243 @@
+"""
+SGA.benchmark
+=============
+
+Code to generate synthetic catalogs and input files for benchmarking the
+expensive steps of the SGA pipeline without access to the real data.
+
+"""
+import os, time
+import numpy as np
+
+def _random_radec(npts, rand):
+    """Uniformly distributed positions on the sphere."""
+    ra = rand.uniform(0, 360, npts)
+    dec = np.degrees(np.arcsin(rand.uniform(-1, 1, npts)))
+    return ra, dec
+
+def mock_parent(ngal, seed=1, fclustered=0.5, nmember=5, sigma_group=5.0,
+                d25min=20/60., d25max=180.0, alpha=2.0):
+    """Generate a synthetic parent catalog with (roughly) realistic clustering and
+    angular diameters.
+
+    A fraction FCLUSTERED of the galaxies are distributed in groups with, on
+    average, NMEMBER members, Gaussian-distributed SIGMA_GROUP (in arcmin)
+    around the group center; the remaining galaxies are distributed uniformly on
+    the sky. Diameters are drawn from a power law N(>D25) ~ D25**(-ALPHA) between
+    D25MIN and D25MAX (both in arcmin).
+
+    """
+    from astropy.table import Table
+
+    rand = np.random.RandomState(seed)
+
+    nclustered = int(fclustered * ngal)
+    ngroup = max(nclustered // nmember, 1)
+    cenra, cendec = _random_radec(ngroup, rand)
+    igroup = rand.randint(0, ngroup, nclustered)
+    dec = cendec[igroup] + rand.normal(0, sigma_group / 60, nclustered)
+    dec = np.clip(dec, -89.999, 89.999)
+    ra = cenra[igroup] + rand.normal(0, sigma_group / 60, nclustered) / np.cos(np.radians(dec))
+
+    fieldra, fielddec = _random_radec(ngal - nclustered, rand)
+    ra = np.hstack((ra, fieldra)) % 360
+    dec = np.hstack((dec, fielddec))
+
+    d25 = d25min * (1 - rand.uniform(0, 1, ngal))**(-1 / alpha)
+    d25 = np.minimum(d25, d25max).astype('f4')
+
+    # Name the galaxies so that some of them look like the SDSS and 2MASS
+    # galaxies which get special treatment in remove_spurious.
+    pgc = np.arange(ngal) + 1
+    prefix = rand.choice(['PGC', 'SDSS', '2MASX'], size=ngal, p=[0.6, 0.3, 0.1])
+    galaxy = np.char.add(prefix, np.char.zfill(pgc.astype(str), 7))
+
+    out = Table()
+    out['SGA_ID'] = np.arange(ngal, dtype='i8')
+    out['GALAXY'] = galaxy
+    out['PGC'] = pgc.astype('i8')
+    out['RA'] = ra
+    out['DEC'] = dec
+    out['D25'] = d25
+    out['BA'] = rand.uniform(0.1, 1.0, ngal).astype('f4')
+    out['PA'] = rand.uniform(0, 180, ngal).astype('f4')
+    out['MAG'] = rand.uniform(10, 18, ngal).astype('f4')
+    out['Z'] = rand.uniform(0, 0.1, ngal).astype('f4')
+    out['SB_D25'] = out['MAG'] + 2.5 * np.log10( np.pi * (60/2)**2 ) + 5 * np.log10(out['D25'])
+    out['BYHAND'] = np.zeros(ngal, bool)
+    out['REF'] = 'MOCK'
+
+    return out
+
+def write_mock_inputs(sampledir, parent, nstar=100000, nccd=200000,
+                      fspurious=0.001, dr='dr9', seed=2):
+    """Write fake Tycho-2, survey-CCDs, and spurious-galaxy files into SAMPLEDIR
+    so that SGA.io and bin/SGA-build-parent can be benchmarked offline.
+
+    """
+    import fitsio
+
+    rand = np.random.RandomState(seed)
+
+    catdir = os.path.join(sampledir, 'catalogs')
+    drdir = os.path.join(sampledir, dr)
+    for dd in (catdir, drdir):
+        if not os.path.isdir(dd):
+            os.makedirs(dd, exist_ok=True)
+
+    # Tycho-2
+    tycho = np.zeros(nstar, dtype=[('RA', 'f8'), ('DEC', 'f8'), ('MAG_BT', 'f4'), ('ISGALAXY', 'u1')])
+    tycho['RA'], tycho['DEC'] = _random_radec(nstar, rand)
+    tycho['MAG_BT'] = rand.uniform(6, 13, nstar)
+    tychofile = os.path.join(catdir, 'tycho2.kd.fits')
+    print('Writing {} fake Tycho-2 stars to {}'.format(nstar, tychofile))
+    fitsio.write(tychofile, tycho, clobber=True)
+
+    # survey-CCDs files, roughly covering the northern and southern footprints
+    for cam, declim in zip(('90prime', 'mosaic', 'decam'), ((32, 80), (32, 80), (-70, 34))):
+        ccds = np.zeros(nccd, dtype=[('ra', 'f8'), ('dec', 'f8'), ('filter', 'S1'), ('ccd_cuts', 'i4')])
+        ccds['ra'] = rand.uniform(0, 360, nccd)
+        sinlim = np.sin(np.radians(declim))
+        ccds['dec'] = np.degrees(np.arcsin(rand.uniform(sinlim[0], sinlim[1], nccd)))
+        if cam == 'mosaic':
+            ccds['filter'] = 'z'
+        elif cam == '90prime':
+            ccds['filter'] = rand.choice(['g', 'r'], size=nccd)
+        else:
+            ccds['filter'] = rand.choice(['g', 'r', 'z'], size=nccd)
+        ccds['ccd_cuts'] = (rand.uniform(0, 1, nccd) < 0.1).astype('i4')
+        ccdsfile = os.path.join(drdir, 'survey-ccds-{}-{}.kd.fits'.format(cam, dr))
+        print('Writing {} fake CCDs to {}'.format(nccd, ccdsfile))
+        fitsio.write(ccdsfile, ccds, clobber=True)
+
+    # Lists of spurious galaxies (at least two, since np.loadtxt in read_spurious
+    # returns scalars for a single row).
+    nspur = max(int(fspurious * len(parent)), 2)
+    I = rand.choice(len(parent), size=nspur, replace=False)
+    rejfile = os.path.join(catdir, 'dr8-psf-reject.txt')
+    np.savetxt(rejfile, np.vstack((parent['SGA_ID'][I], parent['RA'][I], parent['DEC'][I])).T,
+               fmt=['%d', '%.7f', '%.7f'])
+
+    I = rand.choice(len(parent), size=nspur, replace=False)
+    rejfile = os.path.join(catdir, 'leda-spurious.txt')
+    np.savetxt(rejfile, np.array(parent['GALAXY'][I]).astype(str), fmt='%s')
+    print('Wrote {} fake spurious galaxies to {}'.format(2 * nspur, catdir))
+
+# Schema of the AllWISE catalog parts (a subset of the columns, including the
+# ones read by bin/match-hyperleda-allwise).
+allwise_dtype = [('designation', 'S20'), ('ra', 'f8'), ('dec', 'f8'),
+                 ('sigra', 'f4'), ('sigdec', 'f4'), ('cntr', 'i8'),
+                 ('nb', 'i4'), ('na', 'i4'), ('cc_flags', 'S4'), ('ph_qual', 'S4'),
+                 ('moon_lev', 'S4'), ('rchi2', 'f4'),
+                 ('w1mpro', 'f4'), ('w1sigmpro', 'f4'), ('w2mpro', 'f4'), ('w2sigmpro', 'f4'),
+                 ('w3mpro', 'f4'), ('w3sigmpro', 'f4'), ('w4mpro', 'f4'), ('w4sigmpro', 'f4'),
+                 ('w1gmag', 'f4'), ('w1gerr', 'f4'), ('w2gmag', 'f4'), ('w2gerr', 'f4'),
+                 ('w3gmag', 'f4'), ('w3gerr', 'f4'), ('w4gmag', 'f4'), ('w4gerr', 'f4'),
+                 ('w1rsemi', 'f4'), ('w1ba', 'f4'), ('w1pa', 'f4'),
+                 ('ext_flg', 'i2'), ('xscprox', 'f4')]
+
+def write_mock_allwise(outdir, ra, dec, nrows=1000000, nparts=48, fmatch=0.8,
+                       seed=3):
+    """Write NPARTS synthetic wise-allwise-cat-partNN.fits files with NROWS rows
+    each to OUTDIR, plus a file list for the --filelist option of
+    bin/match-hyperleda-allwise.
+
+    Like the real catalog, the parts are (equal-area) bands of declination. A
+    fraction FMATCH of the input (external) positions RA, DEC get a counterpart
+    within about an arcsecond; the remaining rows are uniformly distributed.
+
+    """
+    import fitsio
+
+    rand = np.random.RandomState(seed)
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir, exist_ok=True)
+
+    decedges = np.degrees(np.arcsin(np.linspace(-1, 1, nparts+1)))
+    ismatched = rand.uniform(0, 1, len(ra)) < fmatch
+
+    allwisefiles = []
+    for ipart in range(nparts):
+        decmin, decmax = decedges[ipart], decedges[ipart+1]
+        cat = np.zeros(nrows, dtype=allwise_dtype)
+
+        I = np.where(ismatched * (dec >= decmin) * (dec < decmax))[0][:nrows]
+        cat['ra'][:len(I)] = (ra[I] + rand.normal(0, 0.5/3600, len(I)) / np.cos(np.radians(dec[I]))) % 360
+        cat['dec'][:len(I)] = np.clip(dec[I] + rand.normal(0, 0.5/3600, len(I)), decmin, decmax)
+
+        nfield = nrows - len(I)
+        sinlim = np.sin(np.radians((decmin, decmax)))
+        cat['ra'][len(I):] = rand.uniform(0, 360, nfield)
+        cat['dec'][len(I):] = np.degrees(np.arcsin(rand.uniform(sinlim[0], sinlim[1], nfield)))
+        cat = cat[np.argsort(cat['dec'])]
+
+        cat['cntr'] = ipart * nrows + np.arange(nrows)
+        cat['designation'] = 'J000000.00+000000.0'
+        cat['cc_flags'] = '0000'
+        cat['ph_qual'] = 'AAAU'
+        cat['rchi2'] = rand.uniform(0.5, 2, nrows)
+        for band, mmin in zip(('1', '2', '3', '4'), (8, 8, 5, 3)):
+            mag = rand.uniform(mmin, mmin+10, nrows)
+            cat['w{}mpro'.format(band)] = mag
+            cat['w{}sigmpro'.format(band)] = 0.01 * 10**(0.2 * (mag - mmin))
+            cat['w{}gmag'.format(band)] = mag - 0.1
+            cat['w{}gerr'.format(band)] = 0.01 * 10**(0.2 * (mag - mmin))
+        cat['w1rsemi'] = rand.uniform(5, 60, nrows)
+        cat['w1ba'] = rand.uniform(0.2, 1, nrows)
+        cat['w1pa'] = rand.uniform(0, 180, nrows)
+        cat['xscprox'] = rand.uniform(0, 100, nrows)
+
+        allwisefile = os.path.join(outdir, 'wise-allwise-cat-part{:02d}.fits'.format(ipart+1))
+        print('Writing {} fake AllWISE sources to {}'.format(nrows, allwisefile))
+        fitsio.write(allwisefile, cat, clobber=True)
+        allwisefiles.append(allwisefile)
+
+    filelist = os.path.join(outdir, 'allwise-filelist.txt')
+    with open(filelist, 'w') as ff:
+        for allwisefile in allwisefiles:
+            ff.write('{}\n'.format(allwisefile))
+
+    return filelist
+
+def run_command(cmd):
+    """Run the command CMD (a list) in a subprocess and return its return code,
+    the elapsed time in seconds, and its peak resident memory in MB (the largest
+    of the process and any of its children, e.g., multiprocessing workers).
+
+    """
+    import subprocess
+
+    t0 = time.time()
+    proc = subprocess.Popen(cmd)
+    _, status, rusage = os.wait4(proc.pid, 0)
+    returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+    return returncode, time.time() - t0, rusage.ru_maxrss / 1024 # ru_maxrss is in kB on Linux
+
+def timeit(func, *args, **kwargs):
+    """Call FUNC and return its output and the elapsed time in seconds."""
+    t0 = time.time()
+    out = func(*args, **kwargs)
+    return out, time.time() - t0
+
+def qa_scaling(results, png=None):
+    """Plot the scaling curves (elapsed time vs catalog size) of each step.
+
+    RESULTS is a dictionary of (sizes, times) tuples keyed by step name.
+
+    """
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(7, 5))
+    for step in results.keys():
+        size, dt = results[step]
+        if len(size) > 0:
+            ax.plot(size, dt, marker='s', label=step)
+    ax.set_xscale('log')
+    ax.set_yscale('log')
+    ax.set_xlabel('Number of Galaxies')
+    ax.set_ylabel('Elapsed Time (sec)')
+    ax.legend(loc='upper left', fontsize=10)
+
+    if png:
+        print('Writing {}'.format(png))
+        fig.savefig(png)
@@ -0,0 +1,212 @@
+"""
+SGA.coadds
+==========
+
+Utilities shared by the custom GALEX and unWISE coadds.
+
+"""
+import os
+from collections import OrderedDict
+import numpy as np
+
+def _nbytes(value):
+    """Memory footprint of an array, a (nested) tuple or list of arrays, or a
+    tractor Image (its pixels and inverse errors).
+
+    """
+    if isinstance(value, (tuple, list)):
+        return sum([_nbytes(vv) for vv in value])
+    if hasattr(value, 'getImage') and hasattr(value, 'getInvError'):
+        return _nbytes(value.getImage()) + _nbytes(value.getInvError())
+    return getattr(value, 'nbytes', 0)
+
+class ImageCache(object):
+    """Least-recently-used cache of (decompressed) images and other arrays, which
+    evicts the oldest entries once the cached arrays exceed MAXMB megabytes.
+
+    Cached arrays are shared between callers, so they must not be modified in
+    place.
+
+    """
+    def __init__(self, maxmb=2048):
+        self.maxbytes = int(maxmb * 1024**2)
+        self.nbytes = 0
+        self.hits, self.misses = 0, 0
+        self._cache = OrderedDict()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    def get(self, key, loader, *args, **kwargs):
+        """Return the cached value of KEY, calling LOADER(*args, **kwargs) (and
+        caching the result) if it is not in the cache.
+
+        """
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return self._cache[key]
+        self.misses += 1
+        value = loader(*args, **kwargs)
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        nbytes = _nbytes(value)
+        if key in self._cache:
+            self.nbytes -= _nbytes(self._cache.pop(key))
+        if nbytes > self.maxbytes:
+            return
+        while self.nbytes + nbytes > self.maxbytes and len(self._cache) > 0:
+            _, old = self._cache.popitem(last=False)
+            self.nbytes -= _nbytes(old)
+        self._cache[key] = value
+        self.nbytes += nbytes
+
+    def clear(self):
+        self._cache.clear()
+        self.nbytes = 0
+
+    def __str__(self):
+        return '{} entries ({:.1f}/{:.1f} MB), {} hits, {} misses'.format(
+            len(self), self.nbytes / 1024**2, self.maxbytes / 1024**2, self.hits, self.misses)
+
+def _wcs_key(wcs):
+    """Tuple of the parameters of a TAN WCS."""
+    return (tuple([float(xx) for xx in wcs.get_crval()]) +
+            tuple([float(xx) for xx in wcs.get_crpix()]) +
+            tuple([float(xx) for xx in wcs.get_cd()]) +
+            (int(wcs.get_width()), int(wcs.get_height())))
+
+class ResampleCache(object):
+    """Cache of the resampling maps (Yo, Xo, Yi, Xi) from resample_with_wcs,
+    keyed on the (target WCS, input WCS) pair and kept in memory (with a MAXMB
+    megabyte budget) and, optionally, as .npz files in CACHE_DIR.
+
+    """
+    def __init__(self, cache_dir=None, maxmb=512):
+        self.cache_dir = cache_dir
+        self.memcache = ImageCache(maxmb=maxmb)
+
+    def __getstate__(self):
+        # Do not ship the in-memory maps to multiprocessing workers.
+        return {'cache_dir': self.cache_dir, 'maxmb': self.memcache.maxbytes / 1024**2}
+
+    def __setstate__(self, state):
+        self.__init__(cache_dir=state['cache_dir'], maxmb=state['maxmb'])
+
+    def key(self, targetwcs, wcs):
+        import hashlib
+        return hashlib.sha1(repr(_wcs_key(targetwcs) + _wcs_key(wcs)).encode()).hexdigest()
+
+    def get(self, targetwcs, wcs):
+        """Return the resampling maps from WCS to TARGETWCS, or None if they
+        do not overlap.
+
+        """
+        return self.memcache.get(self.key(targetwcs, wcs), self._load, targetwcs, wcs)
+
+    def _load(self, targetwcs, wcs):
+        cachefile = None
+        if self.cache_dir is not None:
+            cachefile = os.path.join(self.cache_dir, '{}.npz'.format(self.key(targetwcs, wcs)))
+            if os.path.isfile(cachefile):
+                with np.load(cachefile) as maps:
+                    if not maps['overlap']:
+                        return None
+                    return tuple([maps[mm] for mm in ('Yo', 'Xo', 'Yi', 'Xi')])
+
+        maps = _resample_maps(targetwcs, wcs)
+
+        if cachefile is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmpfile = cachefile + '.tmp.npz'
+            if maps is None:
+                np.savez(tmpfile, overlap=False)
+            else:
+                np.savez(tmpfile, overlap=True, Yo=maps[0], Xo=maps[1], Yi=maps[2], Xi=maps[3])
+            os.rename(tmpfile, cachefile)
+
+        return maps
+
+def _resample_maps(targetwcs, wcs):
+    from astrometry.util.resample import resample_with_wcs, ResampleError
+    try:
+        Yo, Xo, Yi, Xi, _ = resample_with_wcs(targetwcs, wcs, [], 3)
+    except ResampleError:
+        return None
+    return Yo, Xo, Yi, Xi
+
+def resample_maps(targetwcs, wcs, resamplecache=None):
+    """Pixel maps (Yo, Xo, Yi, Xi) from WCS onto TARGETWCS, or None if they do
+    not overlap, optionally through a ResampleCache.
+
+    """
+    if resamplecache is None:
+        return _resample_maps(targetwcs, wcs)
+    return resamplecache.get(targetwcs, wcs)
+
+def chunked_rgb(imgs, rgbfunc, nrows=1024, pad=0, **kwargs):
+    """Render a color image from the list of (equal-size) images IMGS in slabs of
+    NROWS rows, so the (float) temporaries of RGBFUNC never exceed the size of
+    one slab, and return it as an H x W x 3 uint8 array for imsave_jpeg.
+
+    RGBFUNC(imgs, **kwargs) returns either a float image in [0, 1] or a uint8
+    image. Each slab is computed on float32 copies padded by PAD rows, which
+    must cover the half-width of any smoothing done by RGBFUNC.
+
+    """
+    H, W = imgs[0].shape
+    rgb = np.empty((H, W, 3), np.uint8)
+    for y0 in range(0, H, nrows):
+        y1 = min(y0 + nrows, H)
+        p0, p1 = max(y0 - pad, 0), min(y1 + pad, H)
+        block = rgbfunc([img[p0:p1].astype(np.float32) for img in imgs], **kwargs)
+        block = block[y0-p0:y1-p0]
+        if block.dtype == np.uint8:
+            rgb[y0:y1] = block
+        else:
+            # Same conversion as matplotlib.pyplot.imsave.
+            np.clip(block, 0., 1., out=block)
+            block *= 255
+            rgb[y0:y1] = block.astype(np.uint8)
+    return rgb
+
+def packed_coadds_filename(output_dir, galaxy, survey):
+    """Name of the packed (multi-extension) coadds file of one galaxy and survey."""
+    return os.path.join(output_dir, '{}-{}-coadds.fits'.format(galaxy, survey))
+
+def write_packed_coadds(packedfile, images, jpgfiles, header=None, verbose=False):
+    """Write all the coadds of one galaxy and survey into a single multi-extension
+    FITS file with a MANIFEST table, instead of one file per product.
+
+    IMAGES is a list of (imtype, band, image) tuples, which are written to
+    IMTYPE-BAND extensions. JPGFILES is a list of (imtype, bands, jpgfile)
+    tuples; the (encoded) JPEG bytes are written to JPEG-IMTYPE-BANDS uint8
+    extensions.
+
+    """
+    import fitsio
+
+    manifest = []
+    tmpfile = packedfile + '.tmp'
+    with fitsio.FITS(tmpfile, 'rw', clobber=True) as F:
+        F.write(None, header=header)
+        for imtype, band, img in images:
+            ext = '{}-{}'.format(imtype, band).upper()
+            F.write(img, extname=ext, header={'IMTYPE': imtype, 'BAND': band})
+            manifest.append( (ext, imtype, band, 'fits') )
+        for imtype, band, jpgfile in jpgfiles:
+            ext = 'JPEG-{}-{}'.format(imtype, band).upper()
+            with open(jpgfile, 'rb') as ff:
+                F.write(np.frombuffer(ff.read(), dtype=np.uint8), extname=ext,
+                        header={'IMTYPE': imtype, 'BAND': band})
+            manifest.append( (ext, imtype, band, 'jpeg') )
+        F.write([np.array(col) for col in zip(*manifest)],
+                names=['EXTNAME', 'IMTYPE', 'BAND', 'FORMAT'], extname='MANIFEST')
+    os.rename(tmpfile, packedfile)
+    if verbose:
+        print('Wrote {} products to {}'.format(len(manifest), packedfile))
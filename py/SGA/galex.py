@@ -38,6 +38,11 @@ def _galex_rgb_dstn(imgs, **kwargs):
     myrgb[:,:,1] = np.clip((myrgb[:,:,0] + myrgb[:,:,2]*0.2), 0., 1.)
     return myrgb
 
+# Rows of padding needed for the chunked rendering of the color images, to cover
+# the gaussian_filter(blue, 1.) kernel (truncated at 4 sigma) in
+# _galex_rgb_official.
+_galex_rgb_pad = 4
+
 def _galex_rgb_official(imgs, **kwargs):
     from scipy.ndimage.filters import uniform_filter, gaussian_filter
     nuv,fuv = imgs
@@ -100,17 +105,26 @@ def _galex_rgb_moustakas(imgs, **kwargs):
     rgb = np.clip(np.dstack((red, green, blue)), 0., 1.)
     return rgb
 
-def _read_galex_tiles(targetwcs, galex_dir, log=None, verbose=False):
-    """Find and read the overlapping GALEX FUV/NUV tiles."""
+# Process-wide cache of the GALEX tile index, keyed on the full path to
+# galex-images.fits.
+_galex_tile_index = {}
 
-    H, W = targetwcs.shape
-    
-    ralo, declo = targetwcs.pixelxy2radec(W, 1)
-    rahi, dechi = targetwcs.pixelxy2radec(1, H)
-    #print('RA',  ralo,rahi)
-    #print('Dec', declo,dechi)
+# Search radius around the GALEX tile centers [degrees]; this is larger than
+# the half-diagonal of a tile (3840 x 3840, 1.5 arcsec/pixel) to allow for the
+# larger RA,Dec boxes (see galex_tile_index) of high-declination tiles.
+_galex_tile_radius = 2 * np.sqrt(2) * 3840*1.5/3600./2.
+
+def galex_tile_index(galex_dir):
+    """Read the GALEX tile table (galex-images.fits) once per process, with the tile
+    boundaries and bricknames precomputed and a kd-tree on the tile centers.
+
+    """
+    from SGA.xmatch import build_tree
 
     fn = os.path.join(galex_dir, 'galex-images.fits')
+    if fn in _galex_tile_index:
+        return _galex_tile_index[fn]
+
     #print('Reading', fn)
     # galex "bricks" (actually just GALEX tiles)
     galex_tiles = fits_table(fn)
@@ -124,6 +138,8 @@ def _read_galex_tiles(targetwcs, galex_dir, log=None, verbose=False):
     galex_tiles.ra2 = galex_tiles.ra + 3840*1.5/3600./2./cosd
     galex_tiles.dec1 = galex_tiles.dec - 3840*1.5/3600./2.
     galex_tiles.dec2 = galex_tiles.dec + 3840*1.5/3600./2.
+
+    # The index is built once per process, so the loop is not a bottleneck.
     bricknames = []
     for tile, subvis in zip(galex_tiles.tilename, galex_tiles.subvis):
         if subvis == -999:
@@ -132,33 +148,270 @@ def _read_galex_tiles(targetwcs, galex_dir, log=None, verbose=False):
             bricknames.append('%s_sg%02i' % (tile.strip(), subvis))
     galex_tiles.brickname = np.array(bricknames)
 
+    # Tiles whose RA,Dec box extends beyond _galex_tile_radius from their center
+    # (near the poles) are always checked explicitly.
+    boxradius = np.zeros(len(galex_tiles))
+    for ra, dec in ((galex_tiles.ra1, galex_tiles.dec1), (galex_tiles.ra1, galex_tiles.dec2),
+                    (galex_tiles.ra2, galex_tiles.dec1), (galex_tiles.ra2, galex_tiles.dec2)):
+        cossep = (np.sin(np.radians(galex_tiles.dec)) * np.sin(np.radians(dec)) +
+                  np.cos(np.radians(galex_tiles.dec)) * np.cos(np.radians(dec)) *
+                  np.cos(np.radians(ra - galex_tiles.ra)))
+        boxradius = np.maximum(boxradius, np.degrees(np.arccos(np.clip(cossep, -1, 1))))
+    polar = np.flatnonzero((boxradius > _galex_tile_radius) | (galex_tiles.dec2 > 90) |
+                           (galex_tiles.dec1 < -90))
+
+    tree = build_tree(galex_tiles.ra, galex_tiles.dec)
+    _galex_tile_index[fn] = (galex_tiles, tree, polar)
+
+    return galex_tiles, tree, polar
+
+def _read_galex_tiles(targetwcs, galex_dir, log=None, verbose=False):
+    """Find and read the overlapping GALEX FUV/NUV tiles."""
+    from SGA.xmatch import within
+
+    H, W = targetwcs.shape
+    
+    ralo, declo = targetwcs.pixelxy2radec(W, 1)
+    rahi, dechi = targetwcs.pixelxy2radec(1, H)
+    #print('RA',  ralo,rahi)
+    #print('Dec', declo,dechi)
+
+    galex_tiles, tree, polar = galex_tile_index(galex_dir)
+
+    # Candidate tiles whose centers are close enough to overlap the target
+    # footprint (a circle around its center which encloses its corners).
+    racen, deccen = targetwcs.pixelxy2radec((W+1) / 2.0, (H+1) / 2.0)
+    corners = np.array([targetwcs.pixelxy2radec(xx, yy) for xx, yy in
+                        ((1, 1), (W, 1), (1, H), (W, H))])
+    radius = np.max(np.degrees(np.arccos(np.clip(
+        np.sin(np.radians(deccen)) * np.sin(np.radians(corners[:, 1])) +
+        np.cos(np.radians(deccen)) * np.cos(np.radians(corners[:, 1])) *
+        np.cos(np.radians(corners[:, 0] - racen)), -1, 1))))
+    _, I, _ = within(tree, racen, deccen, radius + _galex_tile_radius)
+    I = np.union1d(I, polar)
+
     # bricks_touching_radec_box(self, ralo, rahi, declo, dechi, scale=None):
-    I, = np.nonzero((galex_tiles.dec1 <= dechi) * (galex_tiles.dec2 >= declo))
+    I = I[(galex_tiles.dec1[I] <= dechi) * (galex_tiles.dec2[I] >= declo)]
     ok = _ra_ranges_overlap(ralo, rahi, galex_tiles.ra1[I], galex_tiles.ra2[I])
     I = I[ok]
-    galex_tiles.cut(I)
+
+    # Index (rather than cut) so the cached table is untouched.
+    galex_tiles = galex_tiles[I]
     if verbose:
         print('-> bricks', galex_tiles.brickname, flush=True, file=log)
 
     return galex_tiles
 
+def _read_galex_image(fn, tilecache=None):
+    """Read (and decompress) a GALEX tile, optionally through an ImageCache."""
+    import fitsio
+    if tilecache is None:
+        return fitsio.read(fn)
+    return tilecache.get(fn, fitsio.read, fn)
+
+def galex_store_filename(store_dir, brick, band):
+    """Name of a GALEX tile in the local tile-compressed store."""
+    return os.path.join(store_dir, brick.tilename.strip(),
+                        '%s-%sd-intbgsub.fits' % (brick.brickname, band))
+
+def _read_galex_cutout(fn, storefile, x0, x1, y0, y1, tilecache=None):
+    """Read pixels [y0:y1+1, x0:x1+1] of a GALEX tile, decompressing only the
+    overlapping tiles of the local store if STOREFILE exists, or else the whole
+    gzipped tile FN (optionally through an ImageCache).
+
+    """
+    import fitsio
+    if storefile is not None and os.path.isfile(storefile):
+        with fitsio.FITS(storefile) as F:
+            return F[1][y0:y1+1, x0:x1+1]
+    img = _read_galex_image(fn, tilecache=tilecache)
+    return img[y0:y1+1, x0:x1+1]
+
+def _build_galex_store_one(args):
+    """Wrapper function for the multiprocessing."""
+    return build_galex_store_one(*args)
+
+def build_galex_store_one(fn, storefile, tile_dims=(256, 256), clobber=False):
+    """Convert one gzipped GALEX tile into a (losslessly) tile-compressed FITS
+    image, so that cutouts can be read without decompressing the whole tile.
+
+    """
+    import fitsio
+
+    if os.path.isfile(storefile) and not clobber:
+        return 0
+    if not os.path.isfile(fn):
+        print('Missing GALEX tile {}'.format(fn))
+        return 0
+
+    img, hdr = fitsio.read(fn, header=True)
+    os.makedirs(os.path.dirname(storefile), exist_ok=True)
+    tmpfile = storefile + '.tmp'
+    fitsio.write(tmpfile, img, header=hdr, compress='gzip', tile_dims=tile_dims,
+                 qlevel=None, clobber=True)
+    os.rename(tmpfile, storefile)
+    return 1
+
+def build_galex_store(galex_dir=None, store_dir=None, bands=('n', 'f'),
+                      tile_dims=(256, 256), nproc=1, clobber=False):
+    """One-time conversion of all the GALEX tiles in GALEX_DIR into a local store
+    of tile-compressed FITS images in STORE_DIR (by default $GALEX_STORE_DIR),
+    which galex_coadds reads cutouts from when it is available.
+
+    """
+    import multiprocessing
+
+    if galex_dir is None:
+        galex_dir = os.environ.get('GALEX_DIR')
+    if store_dir is None:
+        store_dir = os.environ.get('GALEX_STORE_DIR')
+
+    galex_tiles, _, _ = galex_tile_index(galex_dir)
+
+    storeargs = list()
+    for band in bands:
+        for brick in galex_tiles[np.flatnonzero(galex_tiles.get('has_'+band))]:
+            fn = os.path.join(galex_dir, brick.tilename.strip(),
+                              '%s-%sd-intbgsub.fits.gz' % (brick.brickname, band))
+            storefile = galex_store_filename(store_dir, brick, band)
+            storeargs.append( (fn, storefile, tile_dims, clobber) )
+    print('Converting {} GALEX tiles into {}'.format(len(storeargs), store_dir), flush=True)
+
+    if nproc > 1:
+        with multiprocessing.Pool(nproc) as p:
+            nconvert = p.map(_build_galex_store_one, storeargs)
+    else:
+        nconvert = [_build_galex_store_one(args) for args in storeargs]
+    print('Converted {} GALEX tiles.'.format(np.sum(nconvert)), flush=True)
+
+    return np.sum(nconvert)
+
+def _galex_tile_one(args):
+    """Wrapper function for the multiprocessing, which also returns the band."""
+    return args[1], galex_tile_one(*args)
+
+def galex_tile_one(brick, band, targetwcs, srcs, keep, galex_dir, store_dir=None,
+                   tilecache=None, resamplecache=None):
+    """Fit the forced photometry of SRCS on one GALEX tile and resample the data
+    and the models (with and without the central galaxy) onto TARGETWCS.
+
+    Returns the output pixel coordinates, the exposure-time weight, and the
+    weighted data, model, and no-central model values in those pixels (or None
+    if the tile does not overlap the mosaic).
+
+    """
+    from SGA.coadds import resample_maps
+    from tractor import (Tractor, NanoMaggies, Image, LinearPhotoCal,
+                         NCircularGaussianPSF, ConstantFitsWcs, ConstantSky)
+
+    zps = dict(n=20.08, f=18.82)
+
+    fn = os.path.join(galex_dir, brick.tilename.strip(),
+                      '%s-%sd-intbgsub.fits.gz' % (brick.brickname, band))
+    #print(fn)
+    storefile = galex_store_filename(store_dir, brick, band) if store_dir else None
+
+    for src in srcs:
+        src.setBrightness(NanoMaggies(**{band: 1}))
+
+    gwcs = Tan(*[float(f) for f in
+                 [brick.crval1, brick.crval2, brick.crpix1, brick.crpix2,
+                  brick.cdelt1, 0., 0., brick.cdelt2, 3840., 3840.]])
+
+    maps = resample_maps(targetwcs, gwcs, resamplecache=resamplecache)
+    if maps is None:
+        return None
+    Yo, Xo, Yi, Xi = maps
+
+    # Only read the block of the tile which overlaps the mosaic.
+    x0, x1, y0, y1 = min(Xi), max(Xi), min(Yi), max(Yi)
+    img = _read_galex_cutout(fn, storefile, x0, x1, y0, y1, tilecache=tilecache)
+    #print('Read', img.shape)
+
+    K = np.flatnonzero(img[Yi-y0, Xi-x0] != 0.)
+    if len(K) == 0:
+        return None
+    Yo, Xo, Yi, Xi = Yo[K], Xo[K], Yi[K], Xi[K]
+
+    wt = brick.get(band + 'exptime')
+    data = wt * img[Yi-y0, Xi-x0]
+
+    bx0, by0 = x0, y0
+    x0, x1, y0, y1 = min(Xi), max(Xi), min(Yi), max(Yi)
+    subwcs = gwcs.get_subimage(x0, y0, x1-x0+1, y1-y0+1)
+    twcs = ConstantFitsWcs(subwcs)
+    timg = img[y0-by0:y1-by0+1, x0-bx0:x1-bx0+1]
+
+    tie = np.ones_like(timg)  ## HACK!
+    #hdr = fitsio.read_header(fn)
+    #zp = hdr['']
+    zp = zps[band]
+    photocal = LinearPhotoCal( NanoMaggies.zeropointToScale(zp), band=band)
+    tsky = ConstantSky(0.0)
+
+    # HACK -- circular Gaussian PSF of fixed size...
+    # in arcsec
+    #fwhms = dict(NUV=6.0, FUV=6.0)
+    # -> sigma in pixels
+    #sig = fwhms[band] / 2.35 / twcs.pixel_scale()
+    sig = 6.0 / np.sqrt(8 * np.log(2)) / twcs.pixel_scale()
+    tpsf = NCircularGaussianPSF([sig], [1.])
+
+    tim = Image(data=timg, inverr=tie, psf=tpsf, wcs=twcs, sky=tsky,
+                photocal=photocal, name='GALEX ' + band + brick.brickname)
+
+    ## Build the model image with and without the central galaxy model
+    ## from a single render of each source after the fit.
+    tractor = Tractor([tim], srcs)
+    tractor.freezeParam('images')
+    tractor.optimize_forced_photometry(priors=False, shared_params=False)
+
+    mod = np.zeros(tim.shape, np.float32)
+    tim.getSky().addTo(mod)
+    mod_nocentral = mod.copy()
+    for src, nocentral in zip(srcs, keep):
+        patch = tractor.getModelPatch(tim, src)
+        if patch is None:
+            continue
+        patch.addTo(mod)
+        if nocentral:
+            patch.addTo(mod_nocentral)
+
+    return Yo, Xo, wt, data, wt * mod[Yi-y0, Xi-x0], wt * mod_nocentral[Yi-y0, Xi-x0]
+
 def galex_coadds(onegal, galaxy=None, radius_mosaic=30, radius_mask=None,
                  pixscale=1.5, ref_pixscale=0.262, output_dir=None, galex_dir=None,
-                 log=None, centrals=True, verbose=False):
+                 log=None, centrals=True, verbose=False, tilecache=None, store_dir=None,
+                 nproc=1, resamplecache=None, packed=False):
     '''Generate custom GALEX cutouts.
     
     radius_mosaic and radius_mask in arcsec
     
     pixscale: GALEX pixel scale in arcsec/pixel.
 
+    tilecache: optional SGA.coadds.ImageCache of decompressed GALEX tiles, which
+    can be shared between calls (see galex_coadds_batch).
+
+    store_dir: local store of tile-compressed GALEX tiles (see build_galex_store;
+    default $GALEX_STORE_DIR), from which only the needed cutout is read.
+
+    nproc: number of processes over which the tiles (of both bands) are fit.
+
+    resamplecache: optional SGA.coadds.ResampleCache of the resampling maps
+    (by default the maps are only shared between the two bands).
+
+    packed: write all the images and JPEGs into a single multi-extension
+    {galaxy}-galex-coadds.fits file (see SGA.coadds.write_packed_coadds).
+
     '''
     import fitsio
+    import tempfile
+    import multiprocessing
     import matplotlib.pyplot as plt
 
-    from astrometry.libkd.spherematch import match_radec
-    from astrometry.util.resample import resample_with_wcs, OverlapError
-    from tractor import (Tractor, NanoMaggies, Image, LinearPhotoCal,
-                         NCircularGaussianPSF, ConstantFitsWcs, ConstantSky)
+    from SGA.xmatch import match_radec
+    from SGA.coadds import (ResampleCache, chunked_rgb, packed_coadds_filename,
+                            write_packed_coadds)
 
     from legacypipe.survey import imsave_jpeg
     from legacypipe.catalog import read_fits_catalog
@@ -166,9 +419,15 @@ def galex_coadds(onegal, galaxy=None, radius_mosaic=30, radius_mask=None,
     if galaxy is None:
         galaxy = 'galaxy'
 
+    if resamplecache is None:
+        resamplecache = ResampleCache()
+
     if galex_dir is None:
         galex_dir = os.environ.get('GALEX_DIR')
 
+    if store_dir is None:
+        store_dir = os.environ.get('GALEX_STORE_DIR')
+
     if output_dir is None:
         output_dir = '.'
 
@@ -245,83 +504,42 @@ def galex_coadds(onegal, galaxy=None, radius_mosaic=30, radius_mask=None,
 
     zps = dict(n=20.08, f=18.82)
 
-    coimgs, comods, coresids, coimgs_central, comods_nocentral = [], [], [], [], []
-    for niceband, band in zip(nicegbands, gbands):
+    # Fit the tiles of both bands, optionally in parallel, and accumulate the
+    # resampled data and models as the results come back.
+    bandimg, bandmod, bandwt, bandmod_nocentral = [dict([(band, np.zeros((H, W), np.float32))
+                                                         for band in gbands]) for _ in range(4)]
+    tileargs = list()
+    for band in gbands:
         J = np.flatnonzero(galex_tiles.get('has_'+band))
         print(len(J), 'GALEX tiles have coverage in band', band)
-
-        coimg = np.zeros((H, W), np.float32)
-        comod = np.zeros((H, W), np.float32)
-        cowt  = np.zeros((H, W), np.float32)
-
-        comod_nocentral = np.zeros((H, W), np.float32)
-
-        for src in srcs:
-            src.setBrightness(NanoMaggies(**{band: 1}))
-
         for j in J:
-            brick = galex_tiles[j]
-            fn = os.path.join(galex_dir, brick.tilename.strip(),
-                              '%s-%sd-intbgsub.fits.gz' % (brick.brickname, band))
-            #print(fn)
+            tileargs.append( (galex_tiles[j], band, targetwcs, srcs, keep, galex_dir, store_dir,
+                              tilecache if nproc <= 1 else None, resamplecache) )
 
-            gwcs = Tan(*[float(f) for f in
-                         [brick.crval1, brick.crval2, brick.crpix1, brick.crpix2,
-                          brick.cdelt1, 0., 0., brick.cdelt2, 3840., 3840.]])
-            img = fitsio.read(fn)
-            #print('Read', img.shape)
-
-            try:
-                Yo, Xo, Yi, Xi, nil = resample_with_wcs(targetwcs, gwcs, [], 3)
-            except OverlapError:
+    def _accumulate(results):
+        for band, result in results:
+            if result is None:
                 continue
+            Yo, Xo, wt, data, mod, mod_nocentral = result
+            bandimg[band][Yo, Xo] += data
+            bandwt[band][Yo, Xo] += wt
+            bandmod[band][Yo, Xo] += mod
+            bandmod_nocentral[band][Yo, Xo] += mod_nocentral
+
+    # Accumulate in the order of the tiles, so the (floating-point) sums do not
+    # depend on which worker finishes first.
+    if nproc > 1 and len(tileargs) > 1:
+        with multiprocessing.Pool(nproc) as p:
+            _accumulate(p.imap(_galex_tile_one, tileargs))
+    else:
+        _accumulate(map(_galex_tile_one, tileargs))
 
-            K = np.flatnonzero(img[Yi, Xi] != 0.)
-            if len(K) == 0:
-                continue
-            Yo, Xo, Yi, Xi = Yo[K], Xo[K], Yi[K], Xi[K]
-
-            wt = brick.get(band + 'exptime')
-            coimg[Yo, Xo] += wt * img[Yi, Xi]
-            cowt [Yo, Xo] += wt
-
-            x0, x1, y0, y1 = min(Xi), max(Xi), min(Yi), max(Yi)
-            subwcs = gwcs.get_subimage(x0, y0, x1-x0+1, y1-y0+1)
-            twcs = ConstantFitsWcs(subwcs)
-            timg = img[y0:y1+1, x0:x1+1]
-
-            tie = np.ones_like(timg)  ## HACK!
-            #hdr = fitsio.read_header(fn)
-            #zp = hdr['']
-            zp = zps[band]
-            photocal = LinearPhotoCal( NanoMaggies.zeropointToScale(zp), band=band)
-            tsky = ConstantSky(0.0)
-            
-            # HACK -- circular Gaussian PSF of fixed size...
-            # in arcsec
-            #fwhms = dict(NUV=6.0, FUV=6.0)
-            # -> sigma in pixels
-            #sig = fwhms[band] / 2.35 / twcs.pixel_scale()
-            sig = 6.0 / np.sqrt(8 * np.log(2)) / twcs.pixel_scale()
-            tpsf = NCircularGaussianPSF([sig], [1.])
-
-            tim = Image(data=timg, inverr=tie, psf=tpsf, wcs=twcs, sky=tsky,
-                        photocal=photocal, name='GALEX ' + band + brick.brickname)
-
-            ## Build the model image with and without the central galaxy model.
-            tractor = Tractor([tim], srcs)
-            mod = tractor.getModelImage(0)
-            tractor.freezeParam('images')
-            tractor.optimize_forced_photometry(priors=False, shared_params=False)
-            mod = tractor.getModelImage(0)
-
-            srcs_nocentral = np.array(srcs)[keep].tolist()
-            #srcs_nocentral = np.array(srcs)[nocentral].tolist()
-            tractor_nocentral = Tractor([tim], srcs_nocentral)
-            mod_nocentral = tractor_nocentral.getModelImage(0)
-
-            comod[Yo, Xo] += wt * mod[Yi-y0, Xi-x0]
-            comod_nocentral[Yo, Xo] += wt * mod_nocentral[Yi-y0, Xi-x0]
+    packedimgs, packedjpgs = [], []
+    coimgs, comods, coresids, coimgs_central, comods_nocentral = [], [], [], [], []
+    for niceband, band in zip(nicegbands, gbands):
+        zp = zps[band]
+        coimg, comod, cowt = bandimg[band], bandmod[band], bandwt[band]
+        comod_nocentral = bandmod_nocentral[band]
 
         coimg /= np.maximum(cowt, 1e-18)
         comod /= np.maximum(cowt, 1e-18)
@@ -346,6 +564,9 @@ def galex_coadds(onegal, galaxy=None, radius_mosaic=30, radius_mask=None,
         # https://asd.gsfc.nasa.gov/archive/galex/FAQ/counts_background.html
         for thisimg, imtype in zip( (coimg, comod, comod_nocentral),
                                 ('image', 'model', 'model-nocentral') ):
+            if packed:
+                packedimgs.append( (imtype, niceband, thisimg * 10**(-0.4 * (zp - 22.5))) )
+                continue
             fitsfile = os.path.join(output_dir, '{}-{}-{}.fits'.format(galaxy, imtype, niceband))
             if verbose:
                 print('Writing {}'.format(fitsfile))
@@ -358,12 +579,58 @@ def galex_coadds(onegal, galaxy=None, radius_mosaic=30, radius_mask=None,
     #_galex_rgb = _galex_rgb_dstn
     _galex_rgb = _galex_rgb_official
 
-    for imgs, imtype in zip( (coimgs, comods, coresids, comods_nocentral, coimgs_central),
-                             ('image', 'model', 'resid', 'model-nocentral', 'image-central') ):
-        rgb = _galex_rgb(imgs)
-        jpgfile = os.path.join(output_dir, '{}-{}-FUVNUV.jpg'.format(galaxy, imtype))
-        if verbose:
-            print('Writing {}'.format(jpgfile))
-        imsave_jpeg(jpgfile, rgb, origin='lower')
+    # Render the packed JPEGs into a temporary directory which is removed even
+    # if writing the packed file fails.
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for imgs, imtype in zip( (coimgs, comods, coresids, comods_nocentral, coimgs_central),
+                                 ('image', 'model', 'resid', 'model-nocentral', 'image-central') ):
+            rgb = chunked_rgb(imgs, _galex_rgb, pad=_galex_rgb_pad)
+            if packed:
+                jpgfile = os.path.join(tmpdir, '{}-FUVNUV.jpg'.format(imtype))
+                packedjpgs.append( (imtype, 'FUVNUV', jpgfile) )
+            else:
+                jpgfile = os.path.join(output_dir, '{}-{}-FUVNUV.jpg'.format(galaxy, imtype))
+                if verbose:
+                    print('Writing {}'.format(jpgfile))
+            imsave_jpeg(jpgfile, rgb, origin='lower')
+
+        if packed:
+            write_packed_coadds(packed_coadds_filename(output_dir, galaxy, 'galex'),
+                                packedimgs, packedjpgs, verbose=verbose)
 
     return 1
+
+def galex_coadds_batch(sample, galaxy, output_dir, galex_dir=None, cache_mb=4096,
+                       tilecache=None, log=None, verbose=False, **kwargs):
+    """Generate custom GALEX cutouts for a list of galaxies, sharing an LRU cache
+    of decompressed GALEX tiles (with a CACHE_MB memory budget) between them.
+
+    The galaxies are processed in order of their nearest GALEX tile, so that
+    neighboring galaxies reuse the same (cached) tiles. GALAXY and OUTPUT_DIR
+    are lists with one entry per row of SAMPLE (or a single OUTPUT_DIR);
+    additional keyword arguments are passed to galex_coadds. Returns the status
+    of each galaxy, in the input order.
+
+    """
+    from SGA.coadds import ImageCache
+    from SGA.xmatch import nearest
+
+    if galex_dir is None:
+        galex_dir = os.environ.get('GALEX_DIR')
+    if tilecache is None:
+        tilecache = ImageCache(maxmb=cache_mb)
+    if np.isscalar(output_dir):
+        output_dir = [output_dir] * len(sample)
+
+    _, tree, _ = galex_tile_index(galex_dir)
+    itile, _ = nearest(tree, sample['RA'], sample['DEC'], _galex_tile_radius)
+    order = np.lexsort((sample['RA'], itile))
+
+    status = np.zeros(len(sample), int)
+    for ii in order:
+        status[ii] = galex_coadds(sample[ii], galaxy=galaxy[ii], output_dir=output_dir[ii],
+                                  galex_dir=galex_dir, log=log, verbose=verbose,
+                                  tilecache=tilecache, **kwargs)
+    print('GALEX tile cache: {}'.format(tilecache), flush=True, file=log)
+
+    return status
@@ -191,6 +191,29 @@ def read_tycho(magcut=99, verbose=False):
     
     return tycho
 
+def _hyperleda_file(version=None):
+    """Return the full path to the Hyperleda catalog of a given parent version and
+    its reference string.
+
+    """
+    if version is None:
+        version = parent_version()
+        
+    if version == 'v1.0':
+        hyperfile = 'hyperleda-d25min10-18may13.fits'
+        ref = 'LEDA-20180513'
+    elif version == 'v2.0':
+        hyperfile = 'hyperleda-d25min10-18nov14.fits'
+        ref = 'LEDA-20181114'
+    elif version == 'v3.0':
+        hyperfile = 'hyperleda-d25min10-18nov14.fits'
+        ref = 'LEDA-20181114'
+    else:
+        print('Unknown version!')
+        raise ValueError
+
+    return os.path.join(sample_dir(), 'hyperleda', hyperfile), ref
+
 def read_hyperleda(verbose=False, allwise=False, version=None):
     """Read the Hyperleda catalog.
 
@@ -215,23 +238,7 @@ def read_hyperleda(verbose=False, allwise=False, version=None):
         raise ValueError
     
     """
-    if version is None:
-        version = parent_version()
-        
-    if version == 'v1.0':
-        hyperfile = 'hyperleda-d25min10-18may13.fits'
-        ref = 'LEDA-20180513'
-    elif version == 'v2.0':
-        hyperfile = 'hyperleda-d25min10-18nov14.fits'
-        ref = 'LEDA-20181114'
-    elif version == 'v3.0':
-        hyperfile = 'hyperleda-d25min10-18nov14.fits'
-        ref = 'LEDA-20181114'
-    else:
-        print('Unknown version!')
-        raise ValueError
-
-    hyperledafile = os.path.join(sample_dir(), 'hyperleda', hyperfile)
+    hyperledafile, ref = _hyperleda_file(version)
     allwisefile = hyperledafile.replace('.fits', '-allwise.fits')
 
     leda = Table(fitsio.read(hyperledafile, ext=1, upper=True))
@@ -286,6 +293,31 @@ def read_hyperleda(verbose=False, allwise=False, version=None):
 
     return leda
 
+def read_hyperleda_changes(changefile, version=None, verbose=False):
+    """Read the list of objects (keyed on PGC) which were added, changed, or
+    removed by an incremental refresh of the Hyperleda catalog (see
+    bin/SGA-parse-hyperleda --previous).
+
+    The refreshed catalog recorded in the CHANGEFILE header must be the
+    Hyperleda catalog of VERSION.
+
+    """
+    hyperledafile, _ = _hyperleda_file(version)
+
+    changes, hdr = fitsio.read(changefile, ext='CHANGES', upper=True, header=True)
+    current = hdr.get('CURRENT')
+    if current is None or current.strip() != os.path.basename(hyperledafile):
+        print('Changes in {} are for {} (refreshed from {}), not {}.'.format(
+            changefile, current, hdr.get('PREVIOUS'), os.path.basename(hyperledafile)))
+        raise ValueError
+
+    changes = Table(changes)
+    changes['STATUS'] = np.char.strip(changes['STATUS'].astype(str))
+    if verbose:
+        print('Read {} changed Hyperleda objects from {}'.format(len(changes), changefile), flush=True)
+
+    return changes
+
 def read_localgroup_dwarfs():
     """Read the sample generated by bin/SGA-localgroup-dwarfs.
 
@@ -296,6 +328,59 @@ def read_localgroup_dwarfs():
 
     return dwarfs
 
+def _coadds_survey(band):
+    """Survey of the coadds in BAND (e.g., NUV, FUVNUV, W1, W1W2)."""
+    return 'unwise' if band.upper().startswith('W') else 'galex'
+
+def read_coadds_manifest(galaxydir, galaxy, survey):
+    """Read the manifest of the packed coadds of one galaxy and survey (galex or
+    unwise; see SGA.coadds.write_packed_coadds). Returns None if there is no
+    packed file.
+
+    """
+    from SGA.coadds import packed_coadds_filename
+    packedfile = packed_coadds_filename(galaxydir, galaxy, survey)
+    if not os.path.isfile(packedfile):
+        return None
+    manifest = Table(fitsio.read(packedfile, ext='MANIFEST'))
+    for col in manifest.colnames:
+        manifest[col] = np.char.strip(manifest[col].astype(str))
+    return manifest
+
+def read_coadd(galaxydir, galaxy, imtype, band):
+    """Read one GALEX or unWISE coadd (e.g., imtype='model-nocentral', band='W1'),
+    either from the packed coadds file or from its own FITS file.
+
+    """
+    from SGA.coadds import packed_coadds_filename
+    packedfile = packed_coadds_filename(galaxydir, galaxy, _coadds_survey(band))
+    if os.path.isfile(packedfile):
+        return fitsio.read(packedfile, ext='{}-{}'.format(imtype, band).upper())
+    return fitsio.read(os.path.join(galaxydir, '{}-{}-{}.fits'.format(galaxy, imtype, band)))
+
+def coadd_jpgfile(galaxydir, galaxy, suffix, outdir):
+    """Return the name of the {galaxy}-{suffix}.jpg color image (e.g.,
+    suffix='image-FUVNUV'), extracting it into OUTDIR from the packed coadds
+    file if there is no JPEG file in GALAXYDIR.
+
+    """
+    from SGA.coadds import packed_coadds_filename
+    jpgfile = os.path.join(galaxydir, '{}-{}.jpg'.format(galaxy, suffix))
+    if os.path.isfile(jpgfile):
+        return jpgfile
+
+    band = suffix.split('-')[-1]
+    if band not in ('FUVNUV', 'W1W2'):
+        return jpgfile
+    packedfile = packed_coadds_filename(galaxydir, galaxy, _coadds_survey(band))
+    if not os.path.isfile(packedfile):
+        return jpgfile
+
+    jpgfile = os.path.join(outdir, '{}-{}.jpg'.format(galaxy, suffix))
+    with open(jpgfile, 'wb') as ff:
+        ff.write(fitsio.read(packedfile, ext='JPEG-{}'.format(suffix).upper()).tobytes())
+    return jpgfile
+
 #def in_footprint(parent, verbose=False):
 #    """Find all galaxies in the DESI footprint.
 #
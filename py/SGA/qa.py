@@ -61,56 +61,61 @@ def qa_binned_radec(cat, nside=64, png=None):
 def qa_multiwavelength_coadds(galaxy, galaxydir, htmlgalaxydir, clobber=False,
                               verbose=True):
     """Montage the multiwavelength coadds into a nice QAplot."""
-
-    # Show the data (GALEX, LS, unWISE from left to right).
-    montagefile = os.path.join(htmlgalaxydir, '{}-multiwavelength-data.png'.format(galaxy))
-
-    if not os.path.isfile(montagefile) or clobber:
-        # Make sure all the files exist.
-        check = True
-        jpgfile = []
-        for suffix in ('image-FUVNUV', 'custom-image-grz', 'image-W1W2'):
-            _jpgfile = os.path.join(galaxydir, '{}-{}.jpg'.format(galaxy, suffix))
-            jpgfile.append(_jpgfile)
-            if not os.path.isfile(_jpgfile):
-                print('File {} not found!'.format(_jpgfile))
-                check = False
+    import tempfile
+    import SGA.io
+
+    # The GALEX and unWISE color images may have to be extracted from the packed
+    # coadds files (see SGA.coadds.write_packed_coadds).
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # Show the data (GALEX, LS, unWISE from left to right).
+        montagefile = os.path.join(htmlgalaxydir, '{}-multiwavelength-data.png'.format(galaxy))
+
+        if not os.path.isfile(montagefile) or clobber:
+            # Make sure all the files exist.
+            check = True
+            jpgfile = []
+            for suffix in ('image-FUVNUV', 'custom-image-grz', 'image-W1W2'):
+                _jpgfile = SGA.io.coadd_jpgfile(galaxydir, galaxy, suffix, tmpdir)
+                jpgfile.append(_jpgfile)
+                if not os.path.isfile(_jpgfile):
+                    print('File {} not found!'.format(_jpgfile))
+                    check = False
                 
-        if check:        
-            cmd = 'montage -bordercolor white -borderwidth 1 -tile 3x1 -geometry +0+0 -resize 512 '
-            cmd = cmd+' '.join(ff for ff in jpgfile)
-            cmd = cmd+' {}'.format(montagefile)
-
-            if verbose:
-                print('Writing {}'.format(montagefile))
-            subprocess.call(cmd.split())
-
-    # Now make a 3x3 montage which has the data, model (no central), residual
-    # (just central) from left to right and GALEX, LS, unWISE from top to
-    # bottom.
-    montagefile = os.path.join(htmlgalaxydir, '{}-multiwavelength-models.png'.format(galaxy))
-
-    if not os.path.isfile(montagefile) or clobber:
-        # Make sure all the files exist.
-        check = True
-        jpgfile = []
-        for suffix in ('image-FUVNUV', 'model-nocentral-FUVNUV', 'image-central-FUVNUV',
-                       'custom-image-grz', 'custom-model-nocentral-grz', 'custom-image-central-grz',
-                       'image-W1W2', 'model-nocentral-W1W2', 'image-central-W1W2'):
-            _jpgfile = os.path.join(galaxydir, '{}-{}.jpg'.format(galaxy, suffix))
-            jpgfile.append(_jpgfile)
-            if not os.path.isfile(_jpgfile):
-                print('File {} not found!'.format(_jpgfile))
-                check = False
+            if check:        
+                cmd = 'montage -bordercolor white -borderwidth 1 -tile 3x1 -geometry +0+0 -resize 512 '
+                cmd = cmd+' '.join(ff for ff in jpgfile)
+                cmd = cmd+' {}'.format(montagefile)
+
+                if verbose:
+                    print('Writing {}'.format(montagefile))
+                subprocess.call(cmd.split())
+
+        # Now make a 3x3 montage which has the data, model (no central), residual
+        # (just central) from left to right and GALEX, LS, unWISE from top to
+        # bottom.
+        montagefile = os.path.join(htmlgalaxydir, '{}-multiwavelength-models.png'.format(galaxy))
+
+        if not os.path.isfile(montagefile) or clobber:
+            # Make sure all the files exist.
+            check = True
+            jpgfile = []
+            for suffix in ('image-FUVNUV', 'model-nocentral-FUVNUV', 'image-central-FUVNUV',
+                           'custom-image-grz', 'custom-model-nocentral-grz', 'custom-image-central-grz',
+                           'image-W1W2', 'model-nocentral-W1W2', 'image-central-W1W2'):
+                _jpgfile = SGA.io.coadd_jpgfile(galaxydir, galaxy, suffix, tmpdir)
+                jpgfile.append(_jpgfile)
+                if not os.path.isfile(_jpgfile):
+                    print('File {} not found!'.format(_jpgfile))
+                    check = False
                 
-        if check:        
-            cmd = 'montage -bordercolor white -borderwidth 1 -tile 3x3 -geometry +0+0 -resize 512 '
-            cmd = cmd+' '.join(ff for ff in jpgfile)
-            cmd = cmd+' {}'.format(montagefile)
-
-            if verbose:
-                print('Writing {}'.format(montagefile))
-            subprocess.call(cmd.split())
+            if check:        
+                cmd = 'montage -bordercolor white -borderwidth 1 -tile 3x3 -geometry +0+0 -resize 512 '
+                cmd = cmd+' '.join(ff for ff in jpgfile)
+                cmd = cmd+' {}'.format(montagefile)
+
+                if verbose:
+                    print('Writing {}'.format(montagefile))
+                subprocess.call(cmd.split())
 
 def ellipse_sbprofile(ellipsefit, minerr=0.0):
     """Convert ellipse-fitting results to a magnitude, color, and surface brightness
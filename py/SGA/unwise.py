@@ -55,9 +55,57 @@ def _unwise_to_rgb(imgs, bands=[1,2], mn=-1, mx=100, arcsinh=1.0):
 
     return rgb
 
+def _unwise_subimage(tim, roiradec):
+    """Cut the pixels inside the (RA, Dec) box ROIRADEC out of an unWISE tractor
+    image, or return None if they do not overlap.
+
+    Unlike tractor.Image.subimage, the WCS of the cutout is the sub-image of the
+    TAN WCS, so tim.wcs.wcs describes the cutout pixels.
+
+    """
+    from tractor import Image, ConstantFitsWcs
+
+    wcs = tim.wcs.wcs
+    H, W = tim.shape
+    r0, r1, d0, d1 = roiradec
+    _, xx, yy = wcs.radec2pixelxy(np.array([r0, r0, r1, r1]), np.array([d0, d1, d0, d1]))
+    x0 = int(np.clip(np.floor(np.min(xx) - 1), 0, W))
+    x1 = int(np.clip(np.ceil(np.max(xx)), 0, W))
+    y0 = int(np.clip(np.floor(np.min(yy) - 1), 0, H))
+    y1 = int(np.clip(np.ceil(np.max(yy)), 0, H))
+    if x1 - x0 <= 1 or y1 - y0 <= 1:
+        return None
+
+    slc = slice(y0, y1), slice(x0, x1)
+    return Image(data=tim.getImage()[slc], inverr=tim.getInvError()[slc],
+                 wcs=ConstantFitsWcs(wcs.get_subimage(x0, y0, x1 - x0, y1 - y0)),
+                 psf=tim.getPsf().getShifted(x0, y0), sky=tim.getSky().shifted(x0, y0),
+                 photocal=tim.getPhotoCal(), name=tim.name)
+
+def _read_unwise_tim(unwise_dir, coadd_id, band, bandname, roiradec, tilecache=None):
+    """Read an unWISE tile as a tractor image, optionally through an ImageCache,
+    and cut out the ROIRADEC box.
+
+    The whole tile is read (and cached, so it is shared by every galaxy on the
+    tile) in either case, so the cutout does not depend on whether TILECACHE is
+    given; the cached images must not be modified.
+
+    """
+    from wise.unwise import get_unwise_tractor_image
+    if tilecache is None:
+        tim = get_unwise_tractor_image(unwise_dir, coadd_id, band, bandname=bandname,
+                                       roiradecbox=None)
+    else:
+        tim = tilecache.get((unwise_dir, coadd_id, band), get_unwise_tractor_image,
+                            unwise_dir, coadd_id, band, bandname=bandname, roiradecbox=None)
+    if tim is None:
+        return None
+    return _unwise_subimage(tim, roiradec)
+
 def unwise_coadds(onegal, galaxy=None, radius_mosaic=30, radius_mask=None,
                   pixscale=2.75, ref_pixscale=0.262, output_dir=None,
-                  unwise_dir=None, verbose=False, log=None, centrals=True):
+                  unwise_dir=None, verbose=False, log=None, centrals=True,
+                  resamplecache=None, packed=False, tilecache=None):
     '''Generate custom unWISE cutouts.
     
     radius_mosaic and radius_mask in arcsec
@@ -65,16 +113,28 @@ def unwise_coadds(onegal, galaxy=None, radius_mosaic=30, radius_mask=None,
     pixscale: WISE pixel scale in arcsec/pixel; make this smaller than 2.75
     to oversample.
 
+    resamplecache: optional SGA.coadds.ResampleCache of the resampling maps
+    (by default the maps are only shared between the four bands).
+
+    packed: write all the images and JPEGs into a single multi-extension
+    {galaxy}-unwise-coadds.fits file (see SGA.coadds.write_packed_coadds).
+
+    tilecache: optional SGA.coadds.ImageCache of the whole-tile unWISE tractor
+    images (pixels, inverse variances, and PSFs), keyed on (unwise_dir,
+    coadd_id, band), which can be shared between calls; each galaxy's region of
+    interest is cut out of the cached tile.
+
     '''
     import fitsio
+    import tempfile
     import matplotlib.pyplot as plt
     
     from astrometry.util.util import Tan
     from astrometry.util.fits import fits_table
-    from astrometry.libkd.spherematch import match_radec
-    from astrometry.util.resample import resample_with_wcs, ResampleError
+    from SGA.xmatch import match_radec
+    from SGA.coadds import (ResampleCache, resample_maps, chunked_rgb,
+                            packed_coadds_filename, write_packed_coadds)
     from wise.forcedphot import unwise_tiles_touching_wcs
-    from wise.unwise import get_unwise_tractor_image
     from tractor import Tractor, Image, NanoMaggies
 
     from legacypipe.survey import imsave_jpeg
@@ -83,6 +143,9 @@ def unwise_coadds(onegal, galaxy=None, radius_mosaic=30, radius_mask=None,
     if galaxy is None:
         galaxy = 'galaxy'
 
+    if resamplecache is None:
+        resamplecache = ResampleCache()
+
     if output_dir is None:
         output_dir = '.'
 
@@ -207,8 +270,8 @@ def unwise_coadds(onegal, galaxy=None, radius_mosaic=30, radius_mask=None,
         # tile whose center is closest to the source.
         for tile in tiles:
             #print('Reading tile {}'.format(tile.coadd_id))
-            tim = get_unwise_tractor_image(unwise_dir, tile.coadd_id, band,
-                                           bandname=wanyband, roiradecbox=roiradec)
+            tim = _read_unwise_tim(unwise_dir, tile.coadd_id, band, wanyband, roiradec,
+                                   tilecache=tilecache)
             if tim is None:
                 print('Actually, no overlap with tile {}'.format(tile.coadd_id))
                 continue
@@ -233,10 +296,10 @@ def unwise_coadds(onegal, galaxy=None, radius_mosaic=30, radius_mask=None,
             mod = _unwise_mod(tim, cat, srcs)
             mod_nocentral = _unwise_mod(tim, cat_nocentral, srcs_nocentral)
 
-            try:
-                Yo, Xo, Yi, Xi, nil = resample_with_wcs(targetwcs, tim.wcs.wcs)
-            except ResampleError:
+            maps = resample_maps(targetwcs, tim.wcs.wcs, resamplecache=resamplecache)
+            if maps is None:
                 continue
+            Yo, Xo, Yi, Xi = maps
             if len(Yo) == 0:
                 continue
 
@@ -267,10 +330,14 @@ def unwise_coadds(onegal, galaxy=None, radius_mosaic=30, radius_mask=None,
 
     # Write out the final images with and without the central and converted into
     # AB nanomaggies.
+    packedimgs, packedjpgs = [], []
     for coadd, imtype in zip( (coimgs, comods, comods_nocentral),
                               ('image', 'model', 'model-nocentral') ):
         for img, band in zip(coadd, wbands):
             vega2ab = vega_to_ab['w{}'.format(band)]
+            if packed:
+                packedimgs.append( (imtype, 'W{}'.format(band), img * 10**(-0.4 * vega2ab)) )
+                continue
             fitsfile = os.path.join(output_dir, '{}-{}-W{}.fits'.format(galaxy, imtype, band))
             if verbose:
                 print('Writing {}'.format(fitsfile))
@@ -281,12 +348,52 @@ def unwise_coadds(onegal, galaxy=None, radius_mosaic=30, radius_mask=None,
     #kwa = dict(mn=-0.05, mx=1., arcsinh=0.5)
     #kwa = dict(mn=-0.1, mx=2., arcsinh=None)
 
-    for imgs, imtype in zip( (coimgs, comods, coresids, comods_nocentral, coimgs_central),
-                             ('image', 'model', 'resid', 'model-nocentral', 'image-central') ):
-        rgb = _unwise_to_rgb(imgs[:2], **kwa) # W1, W2
-        jpgfile = os.path.join(output_dir, '{}-{}-W1W2.jpg'.format(galaxy, imtype))
-        if verbose:
-            print('Writing {}'.format(jpgfile))
-        imsave_jpeg(jpgfile, rgb, origin='lower')
+    # Render the packed JPEGs into a temporary directory which is removed even
+    # if writing the packed file fails.
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for imgs, imtype in zip( (coimgs, comods, coresids, comods_nocentral, coimgs_central),
+                                 ('image', 'model', 'resid', 'model-nocentral', 'image-central') ):
+            rgb = chunked_rgb(imgs[:2], _unwise_to_rgb, **kwa) # W1, W2
+            if packed:
+                jpgfile = os.path.join(tmpdir, '{}-W1W2.jpg'.format(imtype))
+                packedjpgs.append( (imtype, 'W1W2', jpgfile) )
+            else:
+                jpgfile = os.path.join(output_dir, '{}-{}-W1W2.jpg'.format(galaxy, imtype))
+                if verbose:
+                    print('Writing {}'.format(jpgfile))
+            imsave_jpeg(jpgfile, rgb, origin='lower')
+
+        if packed:
+            write_packed_coadds(packed_coadds_filename(output_dir, galaxy, 'unwise'),
+                                packedimgs, packedjpgs, verbose=verbose)
 
     return 1
+
+def unwise_coadds_batch(sample, galaxy, output_dir, cache_mb=4096, tilecache=None,
+                        log=None, verbose=False, **kwargs):
+    """Generate custom unWISE cutouts for a list of galaxies, sharing an LRU cache
+    of unWISE tractor images (with a CACHE_MB memory budget) between them.
+
+    The galaxies are processed in RA order within one-degree declination strips,
+    so that neighboring galaxies run one after the other. GALAXY and OUTPUT_DIR
+    are lists with one entry per row of SAMPLE (or a single OUTPUT_DIR);
+    additional keyword arguments are passed to unwise_coadds. Returns the status
+    of each galaxy, in the input order.
+
+    """
+    from SGA.coadds import ImageCache
+
+    if tilecache is None:
+        tilecache = ImageCache(maxmb=cache_mb)
+    if np.isscalar(output_dir):
+        output_dir = [output_dir] * len(sample)
+
+    order = np.lexsort((sample['RA'], np.floor(sample['DEC'])))
+
+    status = np.zeros(len(sample), int)
+    for ii in order:
+        status[ii] = unwise_coadds(sample[ii], galaxy=galaxy[ii], output_dir=output_dir[ii],
+                                   log=log, verbose=verbose, tilecache=tilecache, **kwargs)
+    print('unWISE tile cache: {}'.format(tilecache), flush=True, file=log)
+
+    return status
@@ -0,0 +1,193 @@
+"""
+SGA.xmatch
+==========
+
+Positional cross-matching on the sphere with kd-trees of unit vectors.
+
+All the queries are vectorized, can be split into batches which are run in
+parallel threads (cKDTree releases the GIL), and the trees can be cached on disk
+for catalogs which are matched against repeatedly.
+
+"""
+import os, pickle, hashlib
+import numpy as np
+
+def radec2pos(ra, dec, dtype='f8'):
+    """Convert RA, Dec (in degrees) to unit vectors."""
+    ra, dec = np.radians(np.atleast_1d(ra)), np.radians(np.atleast_1d(dec))
+    pos = np.empty((len(ra), 3), dtype=dtype)
+    pos[:, 2] = np.sin(dec)
+    pos[:, 1] = np.cos(dec)
+    pos[:, 0] = pos[:, 1]
+    pos[:, 0] *= np.sin(ra)
+    pos[:, 1] *= np.cos(ra)
+    return pos
+
+def deg2chord(deg):
+    """Convert an angular separation in degrees to a chord length."""
+    return 2 * np.sin(np.radians(np.minimum(deg, 180.0)) / 2)
+
+def chord2deg(chord):
+    """Convert a chord length to an angular separation in degrees."""
+    return np.degrees(2 * np.arcsin(np.clip(chord / 2, 0, 1)))
+
+def _poskey(pos):
+    return hashlib.sha1(np.ascontiguousarray(pos).view('u1')).hexdigest()
+
+def tree_from_pos(pos, cachefile=None, leafsize=16):
+    """Build a kd-tree from an array of unit vectors, optionally reading it from
+    (or writing it to) CACHEFILE. A cached tree is only used if it was built
+    from exactly the same positions.
+
+    """
+    from scipy.spatial import cKDTree
+
+    key = _poskey(pos) if cachefile is not None else None
+    if cachefile is not None and os.path.isfile(cachefile):
+        with open(cachefile, 'rb') as ff:
+            cache = pickle.load(ff)
+        if cache.get('key') == key:
+            print('Read kd-tree of {} points from {}'.format(len(pos), cachefile))
+            return cache['tree']
+        print('Ignoring stale kd-tree cache {}'.format(cachefile))
+
+    tree = cKDTree(pos, leafsize=leafsize)
+
+    if cachefile is not None:
+        print('Writing kd-tree of {} points to {}'.format(len(pos), cachefile))
+        tmpfile = cachefile + '.tmp'
+        with open(tmpfile, 'wb') as ff:
+            pickle.dump({'key': key, 'tree': tree}, ff, protocol=pickle.HIGHEST_PROTOCOL)
+        os.rename(tmpfile, cachefile)
+
+    return tree
+
+def build_tree(ra, dec, cachefile=None, leafsize=16, dtype='f8'):
+    """Build a kd-tree from RA, Dec (in degrees); see tree_from_pos."""
+    return tree_from_pos(radec2pos(ra, dec, dtype=dtype), cachefile=cachefile, leafsize=leafsize)
+
+def _batched(func, npts, batchsize=100000, workers=1):
+    """Call FUNC(first, last) over consecutive batches of NPTS points, in
+    parallel threads if WORKERS > 1, and return the list of results in order.
+
+    """
+    batches = [(first, min(first + batchsize, npts)) for first in range(0, npts, batchsize)]
+    if workers > 1 and len(batches) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda bb: func(*bb), batches))
+    return [func(*bb) for bb in batches]
+
+def nearest(tree, ra, dec, radius, batchsize=100000, workers=1):
+    """Find the nearest point in TREE within RADIUS (in degrees) of each input
+    position.
+
+    Returns the index into TREE (-1 if there is no match) and the separation in
+    degrees (infinite if there is no match) for every input position.
+
+    """
+    pos = radec2pos(ra, dec, dtype=tree.data.dtype)
+    chord = deg2chord(radius)
+
+    def _query(first, last):
+        return tree.query(pos[first:last], 1, distance_upper_bound=chord)
+
+    out = _batched(_query, len(pos), batchsize=batchsize, workers=workers)
+    if len(out) == 0:
+        return np.zeros(0, int), np.zeros(0)
+    dist = np.hstack([oo[0] for oo in out])
+    index = np.hstack([oo[1] for oo in out])
+
+    good = np.isfinite(dist)
+    index[~good] = -1
+    dist[good] = chord2deg(dist[good])
+    return index, dist
+
+_nearest = nearest # shadowed by the NEAREST keyword in match_radec
+
+def within(tree, ra, dec, radius, batchsize=100000, workers=1):
+    """Find every point in TREE within RADIUS (in degrees) of each input
+    position. RADIUS may be a scalar or one radius per input position.
+
+    Returns flat arrays of the index into the input positions, the index into
+    TREE, and the separation in degrees of every pair, sorted by input index.
+
+    """
+    pos = radec2pos(ra, dec, dtype=tree.data.dtype)
+    chord = np.broadcast_to(deg2chord(np.asarray(radius, dtype='f8')), len(pos))
+
+    def _query(first, last):
+        near = tree.query_ball_point(pos[first:last], chord[first:last])
+        nnear = np.array([len(nn) for nn in near], dtype=int)
+        i2 = np.hstack([np.zeros(0, int)] + [np.asarray(nn, dtype=int) for nn in near])
+        i1 = first + np.repeat(np.arange(last - first), nnear)
+        d12 = np.sqrt(np.sum((tree.data[i2].astype('f8') - pos[i1].astype('f8'))**2, axis=1))
+        return i1, i2, d12
+
+    out = _batched(_query, len(pos), batchsize=batchsize, workers=workers)
+    if len(out) == 0:
+        return np.zeros(0, int), np.zeros(0, int), np.zeros(0)
+    i1 = np.hstack([oo[0] for oo in out])
+    i2 = np.hstack([oo[1] for oo in out])
+    d12 = chord2deg(np.hstack([oo[2] for oo in out]))
+    return i1, i2, d12
+
+def self_match(ra, dec, radius, tree=None):
+    """Find all the distinct pairs of points in a catalog separated by less than
+    RADIUS (in degrees).
+
+    Returns flat arrays of the first and second index of each pair (with the
+    first index always smaller than the second) and their separation in
+    degrees, sorted by the first and then the second index.
+
+    """
+    pos = radec2pos(ra, dec)
+    if tree is None:
+        tree = tree_from_pos(pos)
+    pairs = tree.query_pairs(deg2chord(radius), output_type='ndarray')
+    if len(pairs) == 0:
+        return np.zeros(0, int), np.zeros(0, int), np.zeros(0)
+    srt = np.lexsort((pairs[:, 1], pairs[:, 0]))
+    i1, i2 = pairs[srt, 0].astype(int), pairs[srt, 1].astype(int)
+    d12 = chord2deg(np.sqrt(np.sum((pos[i1] - pos[i2])**2, axis=1)))
+    return i1, i2, d12
+
+def match_radec(ra1, dec1, ra2, dec2, radius, nearest=False, notself=False,
+                tree2=None, batchsize=100000, workers=1):
+    """Drop-in replacement for astrometry.libkd.spherematch.match_radec.
+
+    Returns the indices m1, m2 of the matched pairs and their separation d12 in
+    degrees. With NEAREST=True only the nearest point in (ra2, dec2) is
+    returned for each point in (ra1, dec1). With NOTSELF=True pairs with m1 ==
+    m2 are dropped (for matching a catalog against itself). An existing tree
+    built from (ra2, dec2) can be passed as TREE2.
+
+    """
+    if tree2 is None:
+        tree2 = build_tree(ra2, dec2)
+
+    if nearest:
+        if notself:
+            # Ask for the two nearest and skip the point itself.
+            pos = radec2pos(ra1, dec1, dtype=tree2.data.dtype)
+            chord = deg2chord(radius)
+            def _query(first, last):
+                dd, ii = tree2.query(pos[first:last], 2, distance_upper_bound=chord)
+                isself = ii[:, 0] == np.arange(first, last)
+                return (np.where(isself, dd[:, 1], dd[:, 0]),
+                        np.where(isself, ii[:, 1], ii[:, 0]))
+            out = _batched(_query, len(pos), batchsize=batchsize, workers=workers)
+            dist = np.hstack([np.zeros(0)] + [oo[0] for oo in out])
+            m2 = np.hstack([np.zeros(0, int)] + [oo[1] for oo in out])
+            m1 = np.flatnonzero(np.isfinite(dist))
+            return m1, m2[m1], chord2deg(dist[m1])
+
+        m2, d12 = _nearest(tree2, ra1, dec1, radius, batchsize=batchsize, workers=workers)
+        m1 = np.flatnonzero(m2 >= 0)
+        return m1, m2[m1], d12[m1]
+
+    m1, m2, d12 = within(tree2, ra1, dec1, radius, batchsize=batchsize, workers=workers)
+    if notself:
+        keep = m1 != m2
+        m1, m2, d12 = m1[keep], m2[keep], d12[keep]
+    return m1, m2, d12